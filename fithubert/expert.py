@@ -54,11 +54,11 @@ class UpstreamExpert(nn.Module):
         When the returning Dict contains the List with more than one Tensor,
         those Tensors should be in the same shape to train a weighted-sum on them.
         """
-        wav_lens = torch.LongTensor([len(wav) for wav in wavs])
         src = pad_sequence(wavs, batch_first=True)
+        wav_lens = torch.tensor([len(wav) for wav in wavs], device=src.device)
 
-        padding_mask = ~torch.lt(
-            torch.arange(max(wav_lens)).unsqueeze(0),
+        padding_mask = torch.ge(
+            torch.arange(src.shape[1], device=src.device).unsqueeze(0),
             wav_lens.unsqueeze(1),
         )
 
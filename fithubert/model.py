@@ -210,6 +210,13 @@ class CustomStudentModelConfig(FairseqDataclass):
         metadata={"help": "Whether to use (naive) layer-wise projection for distillation"}
     )
 
+    compile_pred_head: bool = field(
+        default=False,
+        metadata={"help": "Whether to compile the DistilHuBERT style prediction head with torch.compile. "
+                          "Specialized on static shapes, so only useful with fixed input lengths. "
+                          "Ignored when there is a single prediction head (n_tasks == 1)"}
+    )
+
     # Time-reduction Layer
     enable_tr_layer: bool = field(
         default=True,
@@ -364,7 +371,12 @@ class CustomStudentModel(BaseFairseqModel):
             self.proj_head = nn.Sequential(
                 nn.Linear(cfg.encoder_embed_dim, pred_head_inter_dim * self.n_tasks),
                 nn.GELU(),
-                SplitLinear(pred_head_inter_dim, self.n_tasks, pred_head_final_dim),
+                SplitLinear(
+                    pred_head_inter_dim,
+                    self.n_tasks,
+                    pred_head_final_dim,
+                    compile_forward=cfg.compile_pred_head,
+                ),
             ) if self.n_tasks > 0 else None
         
         self.final_proj = None
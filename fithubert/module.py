@@ -1,4 +1,5 @@
 import math
+import warnings
 from typing import List, Tuple
 
 import numpy as np
@@ -585,38 +586,56 @@ class TransformerSentenceEncoderLayer(nn.Module):
 class SplitLinear(nn.Module):
     """Split Linear Layer"""
 
-    def __init__(self, in_dim, in_split, out_dim):
+    _compiled_split_forward = None
+
+    def __init__(self, in_dim, in_split, out_dim, compile_forward=False):
         super().__init__()
 
         self.in_dim = in_dim  # Din
         self.in_split = in_split  # N
         self.out_dim = out_dim  # Dout
+        self.compile_forward = compile_forward and in_split > 1
 
         if in_split > 1:
-            weight = torch.zeros((self.in_split, self.in_dim, self.out_dim))
+            weight = torch.empty((self.in_split, self.in_dim, self.out_dim))
+            nn.init.uniform_(weight, -(self.in_dim ** -0.5), self.in_dim ** -0.5)
             self.weight = nn.Parameter(weight, requires_grad=True)
-            nn.init.uniform_(self.weight, -(self.in_dim ** -0.5), self.in_dim ** -0.5)
 
-            bias = torch.zeros((1, 1, self.in_split, self.out_dim))
+            bias = torch.empty((1, 1, self.in_split, self.out_dim))
+            nn.init.uniform_(bias, -(self.in_dim ** -0.5), self.in_dim ** -0.5)
             self.bias = nn.Parameter(bias, requires_grad=True)
-            nn.init.uniform_(self.bias, -(self.in_dim ** -0.5), self.in_dim ** -0.5)
         else:
             self.layer = nn.Linear(self.in_dim, self.out_dim)
+            if compile_forward:
+                warnings.warn("SplitLinear: compile_forward is ignored when in_split == 1")
 
     def forward(self, x:torch.Tensor):
         # x: shape = B x T x NDin
 
         if self.in_split == 1:
             return self.layer(x)
+        elif self.compile_forward:
+            # Kept on the class and called unbound so that deepcopy and pickling still work.
+            # CUDA graph capture replays the call as one launch; recompiles on new shapes
+            if SplitLinear._compiled_split_forward is None:
+                SplitLinear._compiled_split_forward = torch.compile(
+                    SplitLinear._split_forward, mode="reduce-overhead", dynamic=False
+                )
+            return SplitLinear._compiled_split_forward(self, x)
         else:
-            x = x.reshape(x.shape[0], x.shape[1], self.in_split, 1, self.in_dim)
-            # x: B x T x N x 1 x Din
+            return self._split_forward(x)
+
+    def _split_forward(self, x:torch.Tensor):
+        # x: shape = B x T x NDin
+        b_sz, t_sz, _ = x.shape
+        x = x.reshape(b_sz * t_sz, self.in_split, self.in_dim).transpose(0, 1)
+        # x: N x BT x Din
 
-            out = torch.einsum("...klm,kmn->...kln", x, self.weight).squeeze(3)
-            # out: B x T x N x Dout
-            out = out + self.bias
+        # Bias is added in the GEMM epilogue
+        out = torch.baddbmm(self.bias.view(self.in_split, 1, self.out_dim), x, self.weight)
+        # out: N x BT x Dout
 
-            return out.reshape(x.shape[0], x.shape[1], -1) # -> B x T x NDout ?
+        return out.transpose(0, 1).reshape(b_sz, t_sz, -1) # -> B x T x NDout
 
 
 class LayerWiseProjHead(nn.Module):
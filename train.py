@@ -33,7 +33,9 @@ class W2V2Distil(LightningModule):
 
         # Load teacher model
         teacher_model = self.yaml_cfg['teacher']['teacher_model']
-        self.teacher_model, teacher_config, self.task_agnostic = load_model_and_config(teacher_model)
+        self.teacher_model, teacher_config, self.task_agnostic = load_model_and_config(
+            teacher_model, use_bf16=self.train_cfg.get('teacher_bf16', False)
+        )
         freeze_model(self.teacher_model)
 
         # Make student config independent of teacher
@@ -101,6 +103,7 @@ class W2V2Distil(LightningModule):
         libri_root = data_cfg['libri_root']
         train_set = data_cfg['train_set']
         test_set = data_cfg['test_set']
+        pad_to_multiple = data_cfg.get('pad_to_multiple', 1)
 
         # download & prepare data
         self.train_data = LibriDataset(
@@ -108,18 +111,21 @@ class W2V2Distil(LightningModule):
             file_path=bucketing_path,
             sets=train_set,
             libri_root=libri_root,
+            pad_to_multiple=pad_to_multiple,
         )
         self.eval_data = LibriDataset(
             batch_size=self.batch_size,
             file_path=bucketing_path,
             sets=['dev-clean'],
             libri_root=libri_root,
+            pad_to_multiple=pad_to_multiple,
         )
         self.test_data = LibriDataset(
             batch_size=self.batch_size,
             file_path=bucketing_path,
             sets=test_set,
             libri_root=libri_root,
+            pad_to_multiple=pad_to_multiple,
         )
 
         # For better pytorch lightning logging
@@ -239,7 +245,11 @@ class W2V2Distil(LightningModule):
 
         # CNN post projection loss
         if self.cnn_loss_weight > 0:
-            cnn_loss = F.l1_loss(student_results["features"], teacher_results["features"][0], reduction="none")
+            cnn_loss = F.l1_loss(
+                student_results["features"],
+                teacher_results["features"][0].type_as(student_results["features"]),
+                reduction="none"
+            )
             cnn_loss = cnn_loss.mean()
             losses['cnn_loss'] = cnn_loss
         else:
@@ -279,7 +289,7 @@ class W2V2Distil(LightningModule):
                     ], dim=1)
                 else:
                     pred = student_results['projections']
-            target = teacher_hiddens.narrow(2, 0, pred.shape[2])
+            target = teacher_hiddens.narrow(2, 0, pred.shape[2]).type_as(pred)
         
             if self.rec_loss_type == 'l1':
                 rec_loss = F.l1_loss(pred, target, reduction="none")
@@ -326,7 +336,7 @@ class W2V2Distil(LightningModule):
         # Attention distribution transfer loss
         if self.attn_loss_weight > 0:
             pred = student_results['layer_results'][-1][1][0]
-            target = teacher_results['layer_results'][-1][1][0][0]
+            target = teacher_results['layer_results'][-1][1][0][0].type_as(pred)
 
             if self.attn_loss_type == 'mse':
                 loss = F.mse_loss(
@@ -357,7 +367,7 @@ class W2V2Distil(LightningModule):
         # Value Relation Transfer Loss
         if self.v_rel_loss_weight > 0:
             pred = student_results['layer_results'][-1][1][1]
-            target = teacher_results['layer_results'][-1][1][0][1]
+            target = teacher_results['layer_results'][-1][1][0][1].type_as(pred)
             loss = F.kl_div(
                 F.log_softmax(pred, dim=-1), 
                 F.softmax(target, dim=-1), 
@@ -496,6 +506,8 @@ if __name__ == '__main__':
         precision=use_fp16,
         max_epochs=num_epochs,
         sync_batchnorm=True,
+        # Only worth it when batch shapes repeat
+        benchmark=YAML_CFG['data'].get('pad_to_multiple', 1) > 1,
         accumulate_grad_batches=accumulate_grad_batches,
         callbacks=[early_stopping, checkpoint_callback],
     )
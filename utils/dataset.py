@@ -4,6 +4,7 @@ import os
 import random
 import pandas as pd
 import torch
+import torch.nn.functional as F
 from torch.nn.utils.rnn import pad_sequence
 from torch.utils.data.dataset import Dataset
 import torchaudio
@@ -16,11 +17,14 @@ class LibriDataset(Dataset):
         batch_size,
         file_path='/workspace/s3prl/s3prl/data/len_for_bucket/',
         sets=['train-clean-100', 'train-clean-360', 'train-other-500'],
-        libri_root='/workspace/LibriSpeech/'
+        libri_root='/workspace/LibriSpeech/',
+        pad_to_multiple=1,
     ):
         super().__init__()
 
         self.libri_root = libri_root
+        # Pad batches to a sample multiple so shapes repeat; padding still counts in the losses
+        self.pad_to_multiple = pad_to_multiple
 
         # Read file
         self.root = file_path
@@ -62,14 +66,23 @@ class LibriDataset(Dataset):
 
     def __getitem__(self, index):
         # Load acoustic feature and pad
-        wave_orig = [self._load_feat(x_file) for x_file in self.X[index]]
-
-        wav_lengths = torch.LongTensor([len(wav) for wav in wave_orig])
-        wav_padding_mask = ~torch.lt(
-            torch.arange(max(wav_lengths)).unsqueeze(0),
+        wave_orig, wav_lengths = [], []
+        for x_file in self.X[index]:
+            wav = self._load_feat(x_file)
+            wave_orig.append(wav)
+            wav_lengths.append(len(wav))
+
+        wav_lengths = torch.LongTensor(wav_lengths)
+        padded_wav = pad_sequence(wave_orig, batch_first=True, padding_value=0.0)
+        if self.pad_to_multiple > 1 and padded_wav.shape[1] % self.pad_to_multiple:
+            padded_wav = F.pad(
+                padded_wav,
+                (0, self.pad_to_multiple - padded_wav.shape[1] % self.pad_to_multiple),
+            )
+        wav_padding_mask = torch.ge(
+            torch.arange(padded_wav.shape[1]).unsqueeze(0),
             wav_lengths.unsqueeze(1),
         )
-        padded_wav = pad_sequence(wave_orig, batch_first=True)
 
         return {'x': padded_wav, 'padding_mask': wav_padding_mask}
 
@@ -1,40 +1,65 @@
 import os
 import yaml
+import functools
+import contextlib
 import torch
 import numpy as np
 import torch.nn as nn
 import torch.nn.functional as F
 from torch.nn.utils.rnn import pad_sequence
-from itertools import groupby
 from datetime import datetime
-from pytz import timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Optional
 
-from fairseq import models, tasks, quantization_utils
-from fairseq.dataclass.utils import convert_namespace_to_omegaconf, merge_with_parent
-from fairseq.checkpoint_utils import load_checkpoint_to_cpu
-from fairseq.tasks.audio_finetuning import AudioFinetuningTask
-from fairseq.models.wav2vec.wav2vec2 import Wav2Vec2Model, Wav2Vec2Config
-from fairseq.models.wav2vec.wav2vec2_asr import Wav2VecCtc, Wav2Vec2CtcConfig
-from fairseq.models.hubert.hubert import HubertModel, HubertConfig
-from omegaconf.omegaconf import open_dict
+
+_DICT = {"<s>": 0, "<pad>": 1, "</s>": 2, "<unk>": 3, "|": 4, "E": 5, 
+    "T": 6, "A": 7, "O": 8, "N": 9, "I": 10, "H": 11, "S": 12, 
+    "R": 13, "D": 14, "L": 15, "U": 16, "M": 17, "W": 18, "C": 19, 
+    "F": 20, "G": 21, "Y": 22, "P": 23, "B": 24, "V": 25, "K": 26, 
+    "'": 27, "X": 28, "J": 29, "Q": 30, "Z": 31}
+
+_LOOKUP = np.asarray(list(_DICT.keys()))
+_LOOKUP.setflags(write=False)
+
+# Byte table for bytes.translate: single-char tokens map to themselves,
+# "|" maps to a space and multi-char tokens keep their id byte
+_TABLE = bytearray(range(256))
+for _tok, _idx in _DICT.items():
+    if len(_tok) == 1:
+        _TABLE[_idx] = ord(_tok)
+_TABLE[_DICT["|"]] = ord(" ")
+_TABLE = bytes(_TABLE)
+_BLANK = bytes([_DICT["<s>"]])
+_SPECIAL_TOKENS = {
+    chr(idx): tok for tok, idx in _DICT.items() if len(tok) > 1 and tok != "<s>"
+}
 
 
 class Decoder:
     def __init__(self):
-        self.dict = {"<s>": 0, "<pad>": 1, "</s>": 2, "<unk>": 3, "|": 4, "E": 5, 
-            "T": 6, "A": 7, "O": 8, "N": 9, "I": 10, "H": 11, "S": 12, 
-            "R": 13, "D": 14, "L": 15, "U": 16, "M": 17, "W": 18, "C": 19, 
-            "F": 20, "G": 21, "Y": 22, "P": 23, "B": 24, "V": 25, "K": 26, 
-            "'": 27, "X": 28, "J": 29, "Q": 30, "Z": 31}
-            
-        self.look_up = np.asarray(list(self.dict.keys()))
+        # Shared read-only tables, built once at import
+        self.dict = _DICT
+        self.look_up = _LOOKUP
+        self.table = _TABLE
+        self.blank = _BLANK
+        self.special_tokens = _SPECIAL_TOKENS
 
     def decode(self, ids):
-        converted_tokens = self.look_up[ids]
-        fused_tokens = [tok[0] for tok in groupby(converted_tokens)]
-        output = ' '.join(''.join(''.join(fused_tokens).split("<s>")).split("|")).rstrip()
-        return output
+        ids = np.asarray(ids)
+        if ids.size == 0:
+            return ''
+
+        # Keep the first id of every run of repeated ids
+        keep = np.empty(len(ids), dtype=bool)
+        keep[0] = True
+        np.not_equal(ids[1:], ids[:-1], out=keep[1:])
+
+        # Blanks are deleted and ids are mapped to characters in one pass
+        output = ids[keep].astype(np.uint8).tobytes().translate(self.table, self.blank).decode('ascii')
+        for byte, tok in self.special_tokens.items():
+            if byte in output:
+                output = output.replace(byte, tok)
+
+        return output.rstrip()
 
 
 class CTCSequenceConverter:
@@ -42,55 +67,80 @@ class CTCSequenceConverter:
         self.return_type = return_type
         
     def __call__(self, ids):
+        # Collapse repeated ids and drop blanks (id 0)
+        fused_ids = torch.unique_consecutive(torch.as_tensor(ids))
+        fused_ids = fused_ids[fused_ids != 0]
+
         if self.return_type == "pt":
-            return torch.tensor([tok[0] for tok in groupby(ids) if tok[0] != 0])
-        
-        return [tok[0] for tok in groupby(ids) if tok[0] != 0]
+            return fused_ids
+
+        return fused_ids.tolist()
 
 
 class TeacherWrapper(nn.Module):
     def __init__(
         self,
         model,
+        hook_layers=True,
+        use_bf16=False,
     ):
         """
         Wrapper for the teacher model 
         The wrapper makes it possible to get every intermediate outputs via hooks
+        Set hook_layers=False for models whose extract_features already returns
+        the per-layer outputs (fairseq wav2vec2), so the encoder layers run without hooks
+        Set use_bf16=True to run the teacher under bf16 autocast on GPUs that support it
         """
         super().__init__()
         self.model = model
+        self.hook_layers = hook_layers
+        self.use_bf16 = use_bf16
         self._hook_layer_hiddens = []
         self._hook_post_cnn = []
 
-        def generate_hook_handler(hiddens: List):
-            def hook_handler(self, input, output):
-                hiddens.append(output)
+        # Hooks look the list up by name, so extract_features can hand it out and start a new one
+        def generate_hook_handler(name: str):
+            def hook_handler(module, input, output):
+                getattr(self, name).append(output)
 
             return hook_handler
 
+        # Features returned by fairseq are taken before post_extract_proj
         self.model.post_extract_proj.register_forward_hook(
-                generate_hook_handler(self._hook_post_cnn)
+                generate_hook_handler("_hook_post_cnn")
             )
 
-        for module in self.model.encoder.layers:
-            module.register_forward_hook(
-                generate_hook_handler(self._hook_layer_hiddens) # -> but is it absolutely needed?
-            )
+        if self.hook_layers:
+            for module in self.model.encoder.layers:
+                module.register_forward_hook(
+                    generate_hook_handler("_hook_layer_hiddens")
+                )
 
     def extract_features(self, source, padding_mask):
-        self._hook_layer_hiddens.clear()
+        self._hook_layer_hiddens = []
+        self._hook_post_cnn = []
         result = {}
 
-        self.model.extract_features(
-            source,
-            padding_mask,
-            mask=None,
-        )
+        # The teacher is frozen, so no autograd graph is needed.
+        # Without use_bf16 it keeps the caller's autocast state untouched.
+        if self.use_bf16 and source.is_cuda and torch.cuda.is_bf16_supported():
+            autocast = torch.autocast(device_type=source.device.type, dtype=torch.bfloat16)
+        else:
+            autocast = contextlib.nullcontext()
+
+        with torch.no_grad(), autocast:
+            res = self.model.extract_features(
+                source,
+                padding_mask,
+                mask=None,
+            )
 
-        hook_layer_hiddens = self._hook_layer_hiddens.copy()
-        self._hook_layer_hiddens.clear()
-        hook_post_cnn = self._hook_post_cnn.copy()
-        self._hook_post_cnn.clear()
+        if self.hook_layers:
+            hook_layer_hiddens, self._hook_layer_hiddens = self._hook_layer_hiddens, []
+        else:
+            # (x, z, lr) from fairseq -> (x, (z, lr)) as returned by the layer forward
+            hook_layer_hiddens = [(x, (z, lr)) for x, z, lr in res['layer_results']]
+        hook_post_cnn, self._hook_post_cnn = self._hook_post_cnn, []
 
         result['layer_results'] = hook_layer_hiddens
         result['x'] = result['layer_results'][-1][0].transpose(0, 1)
@@ -99,9 +149,52 @@ class TeacherWrapper(nn.Module):
         return result
 
 
-def load_model_and_config(filename, arg_overrides: Optional[Dict[str, Any]] = None):
+def _load_checkpoint(filename, arg_overrides=None):
+    from fairseq.checkpoint_utils import load_checkpoint_to_cpu
 
     state = load_checkpoint_to_cpu(filename, arg_overrides)
+    # Keep only what load_model_and_config needs (drops e.g. last_optimizer_state)
+    return {key: state.get(key) for key in ("args", "cfg", "model", "task_state")}
+
+
+@functools.lru_cache(maxsize=4)
+def _load_checkpoint_cached(filename, mtime, arg_overrides):
+    # mtime is part of the cache key so that a rewritten checkpoint is reloaded
+    return _load_checkpoint(filename, dict(arg_overrides) if arg_overrides else None)
+
+
+def clear_checkpoint_cache():
+    """Free the checkpoint states cached by load_model_and_config."""
+    _load_checkpoint_cached.cache_clear()
+
+
+def load_model_and_config(
+    filename,
+    arg_overrides: Optional[Dict[str, Any]] = None,
+    use_cache: bool = False,
+    use_bf16: bool = False,
+):
+    # fairseq is imported here so that the rest of this module can be used without it
+    from fairseq import tasks
+    from fairseq.dataclass.utils import convert_namespace_to_omegaconf, merge_with_parent
+    from fairseq.tasks.audio_finetuning import AudioFinetuningTask
+    from fairseq.models.wav2vec.wav2vec2 import Wav2Vec2Model, Wav2Vec2Config
+    from fairseq.models.wav2vec.wav2vec2_asr import Wav2VecCtc, Wav2Vec2CtcConfig
+    from fairseq.models.hubert.hubert import HubertModel, HubertConfig
+    from omegaconf.omegaconf import open_dict
+
+    if use_cache:
+        try:
+            overrides_key = frozenset(arg_overrides.items()) if arg_overrides else None
+        except TypeError:
+            # Unhashable override values (e.g. dicts or lists) cannot be cached
+            use_cache = False
+
+    if use_cache:
+        # The cached state is shared between calls; do not modify its tensors
+        state = _load_checkpoint_cached(filename, os.path.getmtime(filename), overrides_key)
+    else:
+        state = _load_checkpoint(filename, arg_overrides)
 
     if "args" in state and state["args"] is not None:
         cfg = convert_namespace_to_omegaconf(state["args"])
@@ -139,12 +232,16 @@ def load_model_and_config(filename, arg_overrides: Optional[Dict[str, Any]] = No
     else:
         raise NotImplementedError(f"model '{model_type}' is not supported.")
 
-    model = quantization_utils.quantize_model_scalar(model, cfg)
+    # quantize_model_scalar is a no-op unless scalar quant noise is configured
+    if getattr(cfg, "quant_noise_scalar", 0):
+        from fairseq import quantization_utils
+
+        model = quantization_utils.quantize_model_scalar(model, cfg)
     model.load_state_dict(state['model'], strict=True, model_cfg=cfg.model)
 
     # Wrap Teacher
     model.encoder.layerdrop = 0
-    model = TeacherWrapper(model)
+    model = TeacherWrapper(model, hook_layers=model_type != 'wav2vec2', use_bf16=use_bf16)
 
     return model, model_cfg, task_agnostic
 
@@ -180,8 +277,25 @@ def dump_yaml(cfg, yaml_dict):
     return dump_dict
 
 
+@functools.lru_cache(maxsize=None)
+def _get_tz(name):
+    # Prefer stdlib zoneinfo; fall back to pytz on Python < 3.9 or without system tzdata
+    try:
+        from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+    except ImportError:
+        pass
+    else:
+        try:
+            return ZoneInfo(name)
+        except ZoneInfoNotFoundError:
+            pass
+
+    from pytz import timezone
+    return timezone(name)
+
+
 def get_time_tag():
-    return datetime.now(timezone('Asia/Seoul')).strftime('%Y-%m-%d_%Hh%Mm%Ss')
+    return datetime.now(_get_tz('Asia/Seoul')).strftime('%Y-%m-%d_%Hh%Mm%Ss')
 
 
 def freeze_model(model):